@@ -3,13 +3,18 @@ import asyncio
 import paramiko
 from io import BytesIO
 import os
+import posixpath
 import re
+import select
+import shlex
+import shutil
 import time
+from concurrent.futures import ThreadPoolExecutor
 from inspect import signature
 from stat import S_ISDIR
-from typing import Tuple, Optional
+from typing import Dict, Tuple, Optional
 
-from paramiko import SSHClient, SFTPClient, SSHException
+from paramiko import SSHClient, SFTPAttributes, SFTPClient, SSHException
 
 
 def connection_retry(func):
@@ -65,24 +70,59 @@ class AsyncParamikoWrapper:
             stderr = BytesIO()
 
             while not channel.exit_status_ready():
-                if timeout > 0 and channel.get_idle_time() > timeout:
+                if channel.eof_received and not (
+                    channel.recv_ready() or channel.recv_stderr_ready()
+                ):
+                    break  # Output is complete, only the exit status is left
+
+                if not await self._wait_readable(channel, timeout):
                     raise TimeoutError(
                         f"Command {command} timed out after {timeout} seconds"
                     )
 
                 await self._read_channel(channel, stdout, stderr)
-                await asyncio.sleep(0.1)
 
             while channel.recv_ready() or channel.recv_stderr_ready():
                 await self._read_channel(channel, stdout, stderr)
 
-            exit_status = channel.recv_exit_status()
+            loop = asyncio.get_running_loop()
+            exit_status = await loop.run_in_executor(
+                None, channel.recv_exit_status
+            )
 
             return stdout.getvalue(), stderr.getvalue(), exit_status
 
         finally:
             channel.close()
 
+    async def _wait_readable(
+        self, channel: paramiko.Channel, timeout: int
+    ) -> bool:
+        """Wait for output, EOF or close on the channel; False on timeout"""
+        loop = asyncio.get_running_loop()
+        wait_timeout = timeout if timeout > 0 else None
+        fd = channel.fileno()
+
+        readable = loop.create_future()
+        try:
+            loop.add_reader(
+                fd, lambda: readable.done() or readable.set_result(None)
+            )
+        except NotImplementedError:
+            # Event loops without add_reader (e.g. Proactor on Windows)
+            ready, _, _ = await loop.run_in_executor(
+                None, select.select, [channel], [], [], wait_timeout
+            )
+            return bool(ready)
+
+        try:
+            await asyncio.wait_for(readable, timeout=wait_timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            loop.remove_reader(fd)
+
     async def _read_channel(
         self,
         channel: paramiko.Channel,
@@ -103,6 +143,12 @@ class AsyncParamikoWrapper:
 
 
 class Board:
+    # Short-lived memo of stat() results so repeated existence probes
+    # don't each cost a round-trip; cleared by every call that can change
+    # the remote side (uploads, writes, mkdir/rmdir, execute/execute_async)
+    _STAT_CACHE_TTL = 1.0
+    _STAT_CACHE_SIZE = 512
+
     def __init__(
         self,
         host: str,
@@ -110,6 +156,7 @@ class Board:
         username: str = "root",
         password: str = "",
         retries: int = 3,
+        block_size: int = 1024 * 1024,
     ):
         self.ip = host
         self._host = host
@@ -117,9 +164,15 @@ class Board:
         self._username = username
         self._password = password
         self._retries = retries
+        self._block_size = block_size
 
         self._client: Optional[SSHClient] = None
-        self._sftp: Optional[SFTPClient] = None
+        self._sftp: Optional[SFTPClient] = None  # Bulk data transfers
+        self._sftp_meta: Optional[SFTPClient] = None  # Listing/stat calls
+        # Created once per connection; a pool of pre-opened session channels
+        # could live here later, but paramiko can't reuse a channel after exec
+        self._async_exec: Optional[AsyncParamikoWrapper] = None
+        self._stat_cache: Dict[str, Tuple[float, Optional[SFTPAttributes]]] = {}  # noqa
         self._connect()
 
     def __enter__(self) -> "Board":
@@ -166,7 +219,17 @@ class Board:
                         banner_timeout=30,
                     )
 
-                self._sftp = self._client.open_sftp()
+                # Larger channel window so transfers aren't throttled by
+                # window adjustments; keepalive stops idle links dropping
+                transport = self._client.get_transport()
+                transport.default_window_size = 4 * 1024 * 1024
+                transport.default_max_packet_size = 32 * 1024
+                transport.set_keepalive(30)
+
+                # Separate channel for metadata so it doesn't queue behind data
+                self._sftp = transport.open_sftp_client()
+                self._sftp_meta = transport.open_sftp_client()
+                self._async_exec = AsyncParamikoWrapper(self._client)
                 logging.info(f"Connected to {self._host}:{
                              self._port} successfully")
                 return
@@ -197,14 +260,17 @@ class Board:
 
     def close(self) -> None:
         """Clean up all connections"""
-        for conn in [self._sftp, self._client]:
+        for conn in [self._sftp, self._sftp_meta, self._client]:
             if conn:
                 try:
                     conn.close()
                 except OSError:
                     pass
         self._sftp = None
+        self._sftp_meta = None
+        self._async_exec = None
         self._client = None
+        self._stat_cache.clear()
 
     @connection_retry
     def download_directory(
@@ -213,33 +279,88 @@ class Board:
         local_dir: str,
         pattern: str = "",
         retry_count: int = 3,
+        concurrency: int = 8,
     ) -> None:
         """Download files from remote directory (non-recursive)"""
+        coro = self.download_directory_async(
+            remote_dir, local_dir, pattern, concurrency=concurrency
+        )
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(coro)
+            return
+        # Called from a running event loop (asyncio.run would raise there):
+        # run the download on its own loop in a helper thread and block,
+        # as a sync call does. Async callers should await
+        # download_directory_async instead.
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(asyncio.run, coro).result()
+
+    async def download_directory_async(
+        self,
+        remote_dir: str,
+        local_dir: str,
+        pattern: str = "",
+        concurrency: int = 8,
+    ) -> None:
+        """Download files from remote directory (non-recursive), one SFTP channel per worker"""  # noqa
         os.makedirs(local_dir, exist_ok=True)
+        matcher = re.compile(pattern).match if pattern else None
 
-        for filename in self._sftp.listdir(remote_dir):
+        filenames = []
+        for attr in self._sftp_meta.listdir_attr(remote_dir):
             # Apply regex filter
-            if pattern and not re.match(pattern, filename):
+            if matcher and not matcher(attr.filename):
+                continue
+
+            # Skip directories (mode comes with the listing, no extra stat)
+            if attr.st_mode is not None and S_ISDIR(attr.st_mode):
+                logging.debug(
+                    f"Skipping directory: {os.path.join(remote_dir, attr.filename)}"  # noqa
+                )
                 continue
 
-            remote_path = os.path.join(remote_dir, filename)
-            local_path = os.path.join(local_dir, filename)
+            filenames.append(attr.filename)
 
-            # Skip directories
+        if not filenames:
+            return
+
+        loop = asyncio.get_running_loop()
+        transport = self._client.get_transport()
+        pending = iter(filenames)
+
+        async def worker() -> None:
+            sftp = await loop.run_in_executor(None, transport.open_sftp_client)  # noqa
             try:
-                if S_ISDIR(self._sftp.stat(remote_path).st_mode):
-                    logging.debug(f"Skipping directory: {remote_path}")
-                    continue
-            except OSError:
-                continue  # Skip missing files
+                # Workers share one iterator, so each file is fetched once
+                for filename in pending:
+                    remote_path = os.path.join(remote_dir, filename)
+                    local_path = os.path.join(local_dir, filename)
+                    await loop.run_in_executor(
+                        None, self._copy_remote, sftp, remote_path, local_path
+                    )
+                    logging.info(f"Downloaded {remote_path} -> {local_path}")
+            finally:
+                sftp.close()
 
-            self._sftp.get(remote_path, local_path)
-            logging.info(f"Downloaded {remote_path} -> {local_path}")
+        workers = min(max(concurrency, 1), len(filenames))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+
+    def _copy_remote(
+        self, sftp: SFTPClient, remote_path: str, local_path: str
+    ) -> None:
+        """Stream a remote file to disk with prefetched, block_size reads"""
+        with sftp.open(remote_path, "rb") as remote_file, open(
+            local_path, "wb"
+        ) as local_file:
+            remote_file.prefetch()
+            shutil.copyfileobj(remote_file, local_file, self._block_size)
 
     @connection_retry
     def download(self, remote_path: str, local_path: str, retry_count: int = 3) -> None:  # noqa
         try:
-            self._sftp.get(remote_path, local_path)
+            self._copy_remote(self._sftp, remote_path, local_path)
             logging.info(f"Downloaded {remote_path} to {local_path}")
         except OSError as e:
             raise FileNotFoundError(f"Remote file not found: {
@@ -247,23 +368,22 @@ class Board:
 
     @connection_retry
     def upload(self, local_path: str, remote_path: str, retry_count: int = 3) -> None:  # noqa
+        self._stat_cache.clear()
         try:
-            self._sftp.put(local_path, remote_path)
+            with open(local_path, "rb") as local_file, self._sftp.open(
+                remote_path, "wb"
+            ) as remote_file:
+                remote_file.set_pipelined(True)
+                shutil.copyfileobj(local_file, remote_file, self._block_size)
             logging.info(f"Uploaded {local_path} to {remote_path}")
         except OSError as e:
             raise FileNotFoundError(
                 f"Local file not found: {local_path}") from e
 
-    @connection_retry
-    def execute(
-        self, command: str, timeout: int = 3600, retry_count: int = 3
-    ) -> Tuple[str, str]:
-        async_exec = AsyncParamikoWrapper(self._client)
-
-        stdout_bytes, stderr_bytes, exit_code = await async_exec.exec_command(
-            command, timeout=timeout
-        )
-
+    @staticmethod
+    def _command_result(
+        command: str, stdout_bytes: bytes, stderr_bytes: bytes, exit_code: int
+    ) -> Tuple[str, str, int]:
         stdout_str = stdout_bytes.decode("utf-8", errors="ignore")
         stderr_str = stderr_bytes.decode("utf-8", errors="ignore")
 
@@ -276,27 +396,93 @@ class Board:
         return stdout_str, stderr_str, exit_code
 
     @connection_retry
-    def file_exists(self, remote_path: str, retry_count: int = 0) -> bool:
+    def execute(
+        self, command: str, timeout: int = 3600, retry_count: int = 3
+    ) -> Tuple[str, str, int]:
+        """Run a short command with blocking reads (use execute_async for
+        long-running commands, large stderr or running commands concurrently)"""
+        self._stat_cache.clear()  # The command may change remote files
+        _, stdout, stderr = self._client.exec_command(command, timeout=timeout)
+        stdout_bytes = stdout.read()
+        stderr_bytes = stderr.read()
+        exit_code = stdout.channel.recv_exit_status()
+
+        return self._command_result(command, stdout_bytes, stderr_bytes, exit_code)  # noqa
+
+    async def execute_async(
+        self, command: str, timeout: int = 3600
+    ) -> Tuple[str, str, int]:
+        self._stat_cache.clear()  # The command may change remote files
+        stdout_bytes, stderr_bytes, exit_code = await self._async_exec.exec_command(  # noqa
+            command, timeout=timeout
+        )
+
+        return self._command_result(command, stdout_bytes, stderr_bytes, exit_code)  # noqa
+
+    def _cached_stat(self, remote_path: str) -> Optional[SFTPAttributes]:
+        """stat() memoized for _STAT_CACHE_TTL seconds; None if missing"""
+        now = time.monotonic()
+        cached = self._stat_cache.get(remote_path)
+        if cached is not None and now - cached[0] < self._STAT_CACHE_TTL:
+            return cached[1]
+
         try:
-            self._sftp.stat(remote_path)
-            return True
+            attr = self._sftp_meta.stat(remote_path)
         except OSError:
-            return False
+            attr = None
+
+        if len(self._stat_cache) >= self._STAT_CACHE_SIZE:
+            self._stat_cache.pop(next(iter(self._stat_cache)))  # Oldest entry
+        self._stat_cache[remote_path] = (now, attr)
+        return attr
+
+    @connection_retry
+    def file_exists(self, remote_path: str, retry_count: int = 0) -> bool:
+        return self._cached_stat(remote_path) is not None
+
+    def _sftp_mkdirs(self, remote_path: str) -> None:
+        """Create remote_path and missing parents over SFTP (like mkdir -p)"""
+        missing = []
+        path = posixpath.normpath(remote_path)
+        # Walk up to the deepest existing ancestor; usually a single stat
+        while path not in ("", "/", "."):
+            try:
+                attr = self._sftp_meta.stat(path)
+            except IOError:
+                missing.append(path)
+                path = posixpath.dirname(path)
+                continue
+            if not S_ISDIR(attr.st_mode):
+                raise FileExistsError(f"Remote path is not a directory: {path}")  # noqa
+            break
+
+        for path in reversed(missing):
+            try:
+                self._sftp_meta.mkdir(path)
+            except IOError:
+                # Tolerate a concurrent creator, like mkdir -p does
+                if not S_ISDIR(self._sftp_meta.stat(path).st_mode):
+                    raise
 
     @connection_retry
     def make_directory(self, remote_path: str, retry_count: int = 3) -> None:
-        self.execute(f"mkdir -p '{remote_path}'")
+        self._stat_cache.clear()
+        self._sftp_mkdirs(remote_path)
 
     @connection_retry
     def remove_directory(self, remote_dir: str, retry_count: int = 3) -> None:
-        self.execute(f"rm -rf '{remote_dir}'")
+        self._stat_cache.clear()
+        self.execute(f"rm -rf {shlex.quote(remote_dir)}")
 
     @connection_retry
     def read_file(self, remote_path: str, retry_count: int = 3) -> str:
         with self._sftp.open(remote_path, "r") as f:
+            f.prefetch()  # Issue all read requests up front
             return f.read().decode("utf-8")
 
     @connection_retry
     def write_file(self, remote_path: str, content: str, retry_count: int = 3) -> None:  # noqa
+        self._stat_cache.clear()
         with self._sftp.open(remote_path, "w") as f:
+            f.set_pipelined(True)  # Don't wait for an ack per 32 KiB chunk
             f.write(content.encode("utf-8"))
@@ -0,0 +1,14 @@
+# conftest.py
+
+import os
+import pytest
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_cmdline_main(config):
+    """Runs the tests on all cores with pytest-xdist (`-n auto`) when it is installed and `-n` wasn't given."""
+    if hasattr(config, 'workerinput'):
+        return # Already inside an xdist worker
+    if not config.pluginmanager.hasplugin('xdist') or config.option.numprocesses is not None:
+        return
+    if (os.cpu_count() or 1) > 1: # A single worker only adds start-up cost
+        config.option.numprocesses = 'auto'
@@ -1,11 +1,14 @@
 # excel_parser.py
 
 import os
+import csv
+import itertools
 import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
 from pandas.errors import EmptyDataError
 from collections.abc import Hashable
-from typing import Any, Dict, List, Tuple, Union, Optional
-import copy
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union, Optional
 import numpy as np # Import numpy for np.nan
 
 # --- Data Cleaning (Enhanced) ---
@@ -15,16 +18,19 @@ NONE_SET = {
     "-NaN", "-nan", "1.#IND", "1.#QNAN", "<NA>", "NA", "NULL", "NaN", "n/a",
     "nan", "null", pd.NaT, "NaT", str(np.nan) # Add string representation of nan
 }
-# Explicitly keep np.nan separate for replacement logic before ffill
-FFILL_REPLACE_SET = {"", " "} # Values to replace with np.nan before ffill
+# String spellings only, for matching whole columns with isin
+NONE_STR_SET = frozenset(x for x in NONE_SET if isinstance(x, str))
+# Every string spelling treated as missing once stripped: NONE_SET's strings plus "None", which
+# pd.read_csv/pd.read_excel already map to NaN, so readers that bypass pandas agree with them
+_NONE_LIKE = NONE_STR_SET | {"None"}
 
 def get_clean_value(raw_value: Any) -> Any | None:
-    """Cleans raw data values, checking against NONE_SET and attempting numeric conversion."""
+    """Cleans raw data values, checking against NONE_SET (plus "None") and attempting numeric conversion."""
     if pd.isna(raw_value): # Handles pd.NA, pd.NaT, np.nan
         return None
     # Check string representation against NONE_SET *after* stripping
     val_str = str(raw_value).strip()
-    if val_str in NONE_SET:
+    if val_str in _NONE_LIKE:
         return None
 
     # Attempt numeric conversion for strings that weren't cleaned above
@@ -58,18 +64,83 @@ def get_clean_value(raw_value: Any) -> Any | None:
 
     return raw_value # Return original value otherwise
 
-def _form_dict_key_from_groupby(key_tuple: Union[tuple, Any], num_keys: int) -> Hashable | None:
-    """Forms a valid dictionary key from groupby results, cleaning parts. Returns None if all parts are None."""
-    if not isinstance(key_tuple, tuple):
-        key_tuple = (key_tuple,)
-
-    cleaned_key_parts = [get_clean_value(k) for k in key_tuple]
-
-    if num_keys > 1 and all(k is None for k in cleaned_key_parts):
+def _form_dict_key(key_parts: List[Any], num_keys: int) -> Optional[Hashable]:
+    """Forms a valid dictionary key from the (already cleaned) key cells of a group. Returns None if all parts are None."""
+    if num_keys > 1 and all(k is None for k in key_parts):
         return None # Invalid multi-key
 
-    # Return single cleaned value if originally one key, else the tuple
-    return cleaned_key_parts[0] if num_keys == 1 else tuple(cleaned_key_parts)
+    # Return single value if originally one key, else the tuple
+    return key_parts[0] if num_keys == 1 else tuple(key_parts)
+
+# --- Optional Fast Readers ---
+# python-calamine (Rust) parses .xlsx much faster than openpyxl; pandas supports it from 2.2
+try:
+    import python_calamine  # noqa: F401
+    XLSX_ENGINE = 'calamine' if tuple(int(v) for v in pd.__version__.split('.')[:2]) >= (2, 2) else 'openpyxl'
+except ImportError:
+    XLSX_ENGINE = 'openpyxl'
+
+def _xlsx_engine() -> str:
+    """pd.read_excel engine: the EXCEL_EXTRACT_ENGINE environment variable when set, else XLSX_ENGINE."""
+    return os.environ.get('EXCEL_EXTRACT_ENGINE') or XLSX_ENGINE
+
+# Read buffer for .csv files; larger than io.DEFAULT_BUFFER_SIZE to cut read syscalls on big files
+CSV_BUFFER_SIZE = 64 * 1024
+
+def _floats_to_clean_objects(floats: np.ndarray) -> np.ndarray:
+    """Converts a float array to objects, turning integer-valued floats (below 1e15) into ints."""
+    out = floats.astype(object)
+    with np.errstate(invalid='ignore'):
+        whole = (floats % 1 == 0) & (np.abs(floats) < 1e15)
+    if whole.any():
+        out[whole] = floats[whole].astype(np.int64).tolist()
+    return out
+
+def _parse_float(text: str) -> Optional[float]:
+    """float(text) for stripped text, or None when float() rejects it."""
+    # Anything float() accepts starts with a digit, sign, '.' or i/n (inf, nan) and ends with a digit, '.'
+    # or f/y/n (inf, infinity, nan); checking that first skips the costly ValueError for ordinary text
+    first_char, last_char = text[:1], text[-1:]
+    if not (first_char.isdecimal() or first_char in ('+', '-', '.', 'i', 'I', 'n', 'N')):
+        return None
+    if not (last_char.isdecimal() or last_char in ('.', 'f', 'F', 'y', 'Y', 'n', 'N')):
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+def _clean_column(values: np.ndarray) -> np.ndarray:
+    """Vectorized get_clean_value for one object column. Missing values become None."""
+    values = values.copy()
+    kinds = pd.Series(values, dtype=object).map(type)
+
+    # Strings: strip, drop NONE_SET spellings, convert numeric text
+    str_mask = kinds.eq(str).to_numpy()
+    if str_mask.any():
+        stripped = pd.Series([text.strip() for text in values[str_mask].tolist()], dtype=object) # Cheaper than .str.strip()
+        stripped = stripped.mask(stripped.isin(_NONE_LIKE), np.nan)
+        present = stripped.notna().to_numpy()
+        stripped = stripped.to_numpy(dtype=object, copy=True)
+        # float() itself decides what counts as a number (pd.to_numeric accepts and rounds differently)
+        parsed = np.array([_parse_float(text) for text in stripped[present].tolist()], dtype=object)
+        is_numeric = np.zeros(len(stripped), dtype=bool)
+        is_numeric[present] = np.not_equal(parsed, None)
+        stripped[is_numeric] = _floats_to_clean_objects(parsed[np.not_equal(parsed, None)].astype(float))
+        values[str_mask] = stripped
+
+    # Floats: integer-valued floats become ints
+    float_mask = kinds.isin([float, np.float64]).to_numpy()
+    if float_mask.any():
+        values[float_mask] = _floats_to_clean_objects(values[float_mask].astype(float))
+
+    values[pd.isna(values)] = None
+    return values
+
+def _clean_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Cleans the whole frame column by column (same rules as get_clean_value), once after reading."""
+    cleaned = {col: _clean_column(df[col].to_numpy(dtype=object)) for col in df.columns}
+    return pd.DataFrame(cleaned, index=df.index, columns=df.columns, dtype=object)
 
 def _check_template_validity(template: List[List[Optional[None]]]) -> bool:
     """Validates template: non-empty list of non-empty lists containing only None."""
@@ -82,52 +153,144 @@ def _check_template_validity(template: List[List[Optional[None]]]) -> bool:
             return False
     return True
 
-def _extract_recursive(
-    df_slice: pd.DataFrame,
-    template: List[List[Optional[None]]]
-) -> Union[Dict[Hashable, Any], List[Any], None]:
-    """Internal recursive helper to extract data based on remaining template levels."""
-    if df_slice.empty or not template:
-        return None
-
-    current_level_config = template[0]
-    num_cols_this_level = len(current_level_config)
-
-    if df_slice.shape[1] < num_cols_this_level:
-        print(f"Warning: Slice has insufficient columns ({df_slice.shape[1]}) for template level ({num_cols_this_level}). Returning None. Slice head:\n{df_slice.head()}")
+def _non_blank(records: Iterable[List[str]]) -> Iterator[List[str]]:
+    """Drops blank and whitespace-only records, as pd.read_csv does."""
+    return (row for row in records if row and not (len(row) == 1 and row[0].isspace()))
+
+def _csv_column_count(excel_path: str, skiprows: int) -> Tuple[Optional[int], int]:
+    """Width of the first non-blank record after `skiprows` (None when there is none), and the file position
+    just past the skipped records; pd.read_csv's own skiprows miscounts records with quoted line breaks."""
+    with open(excel_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(iter(f.readline, '')) # readline, unlike iteration, keeps f.tell() usable
+        for _ in itertools.islice(reader, skiprows):
+            pass
+        data_start = f.tell()
+        first_row = next(_non_blank(reader), None)
+    return (len(first_row) if first_row is not None else None), data_start
+
+def _read_csv_rows(excel_path: str, skiprows: int, num_cols: int) -> List[List[str]]:
+    """Reads a .csv with the stdlib csv module, without pd.read_csv.
+
+    Returns the non-blank rows after `skiprows`, cut to `num_cols` columns. skiprows counts records (blank lines included).
+    """
+    with open(excel_path, newline='', encoding='utf-8-sig', buffering=CSV_BUFFER_SIZE) as f:
+        return [row[:num_cols] for row in _non_blank(itertools.islice(csv.reader(f), skiprows, None))]
+
+def _xlsx_cell_value(cell: Any) -> Any:
+    """A read-only openpyxl cell's value as pd.read_excel converts it: error cells become NaN
+    (still counted in the row width), whole-number numeric cells become ints."""
+    value = cell.value
+    if value is None:
         return None
+    if cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC:
+        as_int = int(value)
+        if as_int == value:
+            return as_int
+        return float(value)
+    return value
+
+def _read_xlsx_openpyxl(excel_path: str, skiprows: int, num_cols: int) -> Tuple[List[Tuple[Any, ...]], int]:
+    """Streams the first sheet of an .xlsx through a read-only openpyxl workbook, without pd.read_excel.
+
+    Returns the rows after `skiprows`, cut to `num_cols` columns, and the sheet width.
+    Follows pd.read_excel: trailing empty cells and rows are dropped, and the width counts skipped rows too.
+    """
+    workbook = load_workbook(excel_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0] # First sheet, as read by pd.read_excel
+        sheet.reset_dimensions() # The stored dimension may be wrong; read what is actually there
+        rows = []
+        width = 0
+        last_row_with_data = -1
+        for row_number, cells in enumerate(sheet.iter_rows()):
+            row = tuple(_xlsx_cell_value(cell) for cell in cells)
+            row_width = len(row)
+            while row_width and (row[row_width - 1] is None or row[row_width - 1] == ''):
+                row_width -= 1
+            if row_width:
+                last_row_with_data = row_number
+                width = max(width, row_width)
+            if row_number >= skiprows:
+                rows.append(row[:min(row_width, num_cols)])
+    finally:
+        workbook.close()
+    return rows[:max(last_row_with_data + 1 - skiprows, 0)], width
+
+def _template_level_spans(template: List[List[Optional[None]]]) -> List[Tuple[int, int]]:
+    """Column range [start, stop) covered by each template level, left to right."""
+    level_spans = []
+    cumulative_cols = 0
+    for level_config in template:
+        level_spans.append((cumulative_cols, cumulative_cols + len(level_config)))
+        cumulative_cols += len(level_config)
+    return level_spans
+
+def _collect_rows(rows: np.ndarray) -> List[Any]:
+    """Turns a 2-D block of cleaned values into result rows, skipping all-None rows.
+    Single-column blocks yield bare values instead of one-element lists."""
+    kept_rows = rows[~pd.isna(rows).all(axis=1)].tolist()
+    if rows.shape[1] == 1:
+        return [row[0] for row in kept_rows]
+    return kept_rows
+
+def _ffill_key_column(column: np.ndarray) -> np.ndarray:
+    """Forward-fills None cells of a key column in place, working on integer codes instead of objects.
+
+    Returns the filled factorize codes (first-appearance order), with leading None cells as -1.
+    """
+    col_codes, uniques = pd.factorize(column)
+    # Index of the last non-missing row at or before each row; leading missing rows point at row 0
+    last_valid = np.where(col_codes >= 0, np.arange(len(col_codes)), 0)
+    np.maximum.accumulate(last_valid, out=last_valid)
+    col_codes = col_codes[last_valid]
+    column[:] = np.append(uniques.astype(object), None)[col_codes] # Code -1 picks the trailing None
+    return col_codes
+
+def _hierarchy_codes(key_col_codes: List[np.ndarray], key_spans: List[Tuple[int, int]]) -> np.ndarray:
+    """Integer group codes per key level, numbered in order of first appearance.
+
+    key_col_codes holds the factorize codes of each key column (-1 for None).
+    The codes of level i identify the whole key path of levels 0..i, so rows sorted
+    by all levels form one contiguous run per group at every level.
+    """
+    num_rows = len(key_col_codes[0])
+    codes = np.empty((len(key_spans), num_rows), dtype=np.int64)
+    path_codes = np.zeros(num_rows, dtype=np.int64)
+    for level, (start, stop) in enumerate(key_spans):
+        for col_idx in range(start, stop):
+            col_codes = key_col_codes[col_idx] + 1 # Shift so None (-1) gets its own code
+            path_codes, _ = pd.factorize(path_codes * (int(col_codes.max()) + 1) + col_codes)
+        codes[level] = path_codes
+    return codes
+
+def _group_bounds(level_codes: np.ndarray, lo: int, hi: int) -> List[Tuple[int, int]]:
+    """Splits the sorted row range [lo, hi) into [start, end) runs of equal codes."""
+    starts = np.flatnonzero(level_codes[lo + 1:hi] != level_codes[lo:hi - 1]) + lo + 1
+    bounds = [lo] + starts.tolist() + [hi]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _extract_slice(
+    values: np.ndarray,
+    codes: np.ndarray,
+    lo: int,
+    hi: int,
+    level: int,
+    level_spans: List[Tuple[int, int]],
+) -> Union[Dict[Hashable, Any], List[Any], None]:
+    """Internal recursive helper to extract sorted rows [lo, hi) from template level `level` down."""
+    start, stop = level_spans[level]
+    num_cols_this_level = stop - start
 
-    if len(template) == 1:
-        leaf_values = []
-        leaf_cols = df_slice.columns[:num_cols_this_level]
-        for _, row in df_slice[leaf_cols].iterrows():
-            row_data = [get_clean_value(row[col]) for col in leaf_cols]
-            if all(v is None for v in row_data):
-                continue
-            leaf_values.append(row_data[0] if num_cols_this_level == 1 else row_data)
+    if level == len(level_spans) - 1:
+        leaf_values = _collect_rows(values[lo:hi, start:stop])
         return leaf_values if leaf_values else None
 
     results: Dict[Hashable, Any] = {}
-    key_column_names = df_slice.columns[:num_cols_this_level].tolist()
-
-    try:
-        grouped = df_slice.groupby(by=key_column_names, sort=False, dropna=False)
-    except Exception as e:
-        print(f"Error during recursive groupby on columns {key_column_names}. Slice info:\n{df_slice.info()}\n{df_slice.head()}")
-        raise RuntimeError(f"Recursive grouping failed: {e}") from e
-
-    for key_tuple, group_df in grouped:
-        dict_key = _form_dict_key_from_groupby(key_tuple, num_cols_this_level)
-
-        next_level_col_indices = list(range(num_cols_this_level, df_slice.shape[1]))
-        if not next_level_col_indices:
-             print(f"Warning: No columns remaining for recursive call at key '{dict_key}'. Check template depth vs data columns.")
-             sub_result = None
-        else:
-            next_level_col_names = df_slice.columns[next_level_col_indices]
-            next_level_df_slice = group_df[next_level_col_names]
-            sub_result = _extract_recursive(next_level_df_slice, template[1:])
-
+    for group_lo, group_hi in _group_bounds(codes[level], lo, hi):
+        dict_key = _form_dict_key(values[group_lo, start:stop].tolist(), num_cols_this_level)
+        sub_result = _extract_slice(values, codes, group_lo, group_hi, level + 1, level_spans)
         if sub_result is not None:
             results[dict_key] = sub_result
 
@@ -144,11 +307,12 @@ def extract_data_with_excel_dict(
     (Args, Returns, Raises documentation remains the same)
     """
     # 1. --- Validation Checks Upfront ---
+    if not _check_template_validity(template): # Pure argument check, before touching the filesystem
+        raise ValueError("Invalid template structure.")
     if not os.path.exists(excel_path):
         raise FileNotFoundError(f"File not found: {excel_path}")
-    if not _check_template_validity(template):
-        raise ValueError("Invalid template structure.")
-    total_template_cols = sum(len(level) for level in template)
+    level_spans = _template_level_spans(template)
+    total_template_cols = level_spans[-1][1]
     if total_template_cols <= 0:
          raise ValueError("Invalid template: requires at least one column.")
 
@@ -157,21 +321,44 @@ def extract_data_with_excel_dict(
     pd_data = pd.DataFrame()
     actual_skiprows = skiprows if skiprows is not None else 0
     read_args = {'header': None, 'skiprows': actual_skiprows}
-    na_values_for_read = list(NONE_SET - {None, '', ' ', pd.NA, pd.NaT}) # Keep '', ' ' as strings initially
+    na_values_for_read = list(_NONE_LIKE) # Blank cells included, so key columns arrive as real NaN for the ffill
+
+    xlsx_engine = _xlsx_engine()
 
     try:
         dtype_settings = object # Read all as object initially
-        if file_ext == '.xlsx':
-            pd_data = pd.read_excel(excel_path, engine='openpyxl', dtype=dtype_settings, keep_default_na=False, na_values=na_values_for_read, **read_args)
+        if file_ext == '.xlsx' and xlsx_engine == 'openpyxl':
+            # Stream rows from a read-only workbook instead of building the full object model
+            rows, sheet_width = _read_xlsx_openpyxl(excel_path, actual_skiprows, total_template_cols)
+            if rows and sheet_width < total_template_cols:
+                raise ValueError(f"Data column count mismatch: Template requires {total_template_cols}, file '{excel_path}' has {sheet_width}.")
+            pd_data = pd.DataFrame(rows, dtype=object).reindex(columns=range(min(sheet_width, total_template_cols)))
+        elif file_ext == '.xlsx':
+            # Callable usecols skips unused columns without failing on narrower sheets
+            pd_data = pd.read_excel(excel_path, engine=xlsx_engine, dtype=dtype_settings, na_values=na_values_for_read,
+                                    usecols=lambda col: col < total_template_cols, **read_args)
         elif file_ext == '.csv':
-             pd_data = pd.read_csv(excel_path, dtype=dtype_settings, keep_default_na=False, na_values=na_values_for_read, **read_args)
+            csv_cols, data_start = _csv_column_count(excel_path, actual_skiprows)
+            if csv_cols is None:
+                return []
+            if csv_cols < total_template_cols:
+                raise ValueError(f"Data column count mismatch: Template requires {total_template_cols}, file '{excel_path}' has {csv_cols}.")
+            if csv_cols == total_template_cols:
+                # Template covers every column: plain csv.reader rows beat read_csv; cleaning converts numbers and missing values
+                pd_data = pd.DataFrame(_read_csv_rows(excel_path, actual_skiprows, total_template_cols), dtype=object)
+            else:
+                # Narrower template: read_csv's usecols skips the unused fields, which csv.reader would split anyway
+                with open(excel_path, newline='', encoding='utf-8-sig') as f:
+                    f.seek(data_start)
+                    pd_data = pd.read_csv(f, header=None, dtype=dtype_settings, na_values=na_values_for_read,
+                                          usecols=list(range(total_template_cols)))
         else:
             raise ValueError(f"Unsupported file type: {file_ext}. Provide .xlsx or .csv.")
 
     except EmptyDataError:
         return []
     except Exception as e:
-        if isinstance(e, ValueError) and "Unsupported file type" in str(e):
+        if isinstance(e, ValueError) and ("Unsupported file type" in str(e) or "column count mismatch" in str(e)):
              raise e
         raise RuntimeError(f"Error reading file '{excel_path}': {str(e)}") from e
 
@@ -181,61 +368,37 @@ def extract_data_with_excel_dict(
     if pd_data.shape[1] < total_template_cols:
          raise ValueError(f"Data column count mismatch: Template requires {total_template_cols}, file '{excel_path}' has {pd_data.shape[1]}.")
 
+    # Columns beyond the template are never used; don't pay for cleaning them
+    pd_data = pd_data.iloc[:, :total_template_cols]
     pd_data.columns = range(pd_data.shape[1])
+    pd_data = _clean_frame(pd_data)
 
     # 4. --- Data Processing ---
     results_list = []
 
     # --- Handle Flat Template (Single Level) ---
-    if len(template) == 1:
-        num_cols = len(template[0])
-        target_cols = list(range(num_cols))
-        for _, row in pd_data[target_cols].iterrows():
-            # Apply cleaning directly for flat data
-            row_data = [get_clean_value(row[col]) for col in target_cols]
-            if not all(v is None for v in row_data):
-                results_list.append(row_data[0] if num_cols == 1 else row_data)
+    if len(level_spans) == 1:
+        results_list = _collect_rows(pd_data.to_numpy(dtype=object))
 
     # --- Handle Hierarchical Template (Multiple Levels) ---
     else:
-        key_col_indices = []
-        cumulative_cols = 0
-        for level_config in template[:-1]:
-            num_cols_in_level = len(level_config)
-            key_col_indices.extend(range(cumulative_cols, cumulative_cols + num_cols_in_level))
-            cumulative_cols += num_cols_in_level
-
-        pd_data_filled = pd_data.copy()
-        if key_col_indices:
-            for col_idx in key_col_indices:
-                 pd_data_filled.loc[:, col_idx] = pd_data_filled.loc[:, col_idx].replace(list(FFILL_REPLACE_SET), np.nan)
-
-            pd_data_filled[key_col_indices] = pd_data_filled[key_col_indices].ffill()
-
-        top_level_config = template[0]
-        num_top_level_keys = len(top_level_config)
-        top_level_key_cols = list(range(num_top_level_keys))
-
-        try:
-            grouped_top_level = pd_data_filled.groupby(by=top_level_key_cols, sort=False, dropna=False)
-        except Exception as e:
-            print(f"Error during top-level groupby on columns {top_level_key_cols}. Data info:\n{pd_data_filled.info()}\n{pd_data_filled.head()}")
-            raise RuntimeError(f"Top-level grouping failed: {e}") from e
-
-        for key_tuple, group_df in grouped_top_level:
-            top_level_dict_key = _form_dict_key_from_groupby(key_tuple, num_top_level_keys)
-
-            all_cols = list(range(pd_data_filled.shape[1]))
-            cols_for_recursion = [c for c in all_cols if c not in top_level_key_cols]
-
-            if not cols_for_recursion:
-                print(f"Warning: No columns remaining for recursion for top-level key '{top_level_dict_key}'. Treating as empty.")
-                sub_result = None
-            else:
-                next_level_df_slice = group_df[cols_for_recursion]
-                sub_template = copy.deepcopy(template[1:])
-                sub_result = _extract_recursive(next_level_df_slice, sub_template)
-
+        # Key columns always come first; only they are forward-filled, leaf columns are reused as-is.
+        # The fill runs on factorize codes, which then also drive the grouping below.
+        values = pd_data.to_numpy(dtype=object, copy=True)
+        num_key_cols = level_spans[-1][0]
+        key_col_codes = [_ffill_key_column(values[:, col_idx]) for col_idx in range(num_key_cols)]
+
+        # Sort once by every key level (stable, first-appearance order) so each
+        # group at each level is a contiguous row range.
+        codes = _hierarchy_codes(key_col_codes, level_spans[:-1])
+        perm = np.lexsort(codes[::-1])
+        values = values[perm]
+        codes = codes[:, perm]
+
+        top_start, top_stop = level_spans[0]
+        for lo, hi in _group_bounds(codes[0], 0, len(values)):
+            top_level_dict_key = _form_dict_key(values[lo, top_start:top_stop].tolist(), top_stop - top_start)
+            sub_result = _extract_slice(values, codes, lo, hi, 1, level_spans)
             if sub_result is not None:
                  results_list.append({top_level_dict_key: sub_result})
 